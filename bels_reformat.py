@@ -1,14 +1,23 @@
 import pandas as pd
 
+DROP_COLUMNS = frozenset(['bels_interpreted_countrycode', 'bels_matchwithcoords',
+                          'bels_matchverbatimcoords', 'bels_matchsanscoords',
+                          'bels_georeferencedby', 'bels_georeferenceddate',
+                          'bels_georeferenceprotocol', 'bels_georeferencesources',
+                          'bels_georeferenceremarks', 'bels_georeference_score',
+                          'bels_georeference_source', 'bels_best_of_n_georeferences',
+                          'bels_match_type'])
+
+
+def read_bels_csv(path) -> pd.DataFrame:
+    """Reads a BELS export, skipping the columns rename_drop_columns would discard."""
+    return pd.read_csv(path, usecols=lambda col: col not in DROP_COLUMNS)
+
+
 def rename_drop_columns(bels_csv: pd.DataFrame):
     print(bels_csv.columns)
-    bels_csv.drop(['bels_interpreted_countrycode', 'bels_matchwithcoords',
-                   'bels_matchverbatimcoords', 'bels_matchsanscoords',
-                   'bels_georeferencedby', 'bels_georeferenceddate',
-                   'bels_georeferenceprotocol', 'bels_georeferencesources',
-                   'bels_georeferenceremarks', 'bels_georeference_score',
-                   'bels_georeference_source','bels_best_of_n_georeferences',
-                   'bels_match_type'], inplace=True, axis=1)
+    # Frames loaded with read_bels_csv never contain these, so this is usually a no-op
+    bels_csv.drop(columns=[col for col in bels_csv.columns if col in DROP_COLUMNS], inplace=True)
 
     bels_csv.rename({'bels_decimallatitude': 'latitude', 'bels_decimallongitude': 'longitude', 'bels_geodeticdatum': 'datum',
                      'bels_coordinateuncertaintyinmeters': 'coordinate_uncertainty_meters'}, inplace=True, axis=1)
@@ -21,4 +30,3 @@ def rename_drop_columns(bels_csv: pd.DataFrame):
     # bels_csv = bels_csv.sample(n=20, random_state=39)
 
     return bels_csv
-
@@ -1,7 +1,5 @@
 """This file will be for post-processing cleaning of Lat/Long coordinates.
 Occupying the last major step of the pipeline. Geolocate --> GVS --> Cleaning"""
-import csv
-
 import pandas as pd
 class CleanCoords:
     def __init__(self, processed_csv):
@@ -9,6 +7,5 @@ class CleanCoords:
         self.placeholder_function()
 
     def placeholder_function(self):
-        self.final_csv.to_csv("geo_csvs/output_csv/final_output.csv", index=False, encoding="utf-8-sig",
-                              quoting=csv.QUOTE_NONNUMERIC)
+        self.final_csv.to_csv("geo_csvs/output_csv/final_output.csv", index=False, encoding="utf-8-sig")
         print("Coordinates Cleaned !")
@@ -21,9 +21,11 @@ class ProcessAll:
 
         self.logger.info("Initializing and running GVS...")
         self.geo_csv.to_csv("geo_csvs/test_csvs/test_geo_output2.csv")
-        self.gvs_process = GVSProcess(geocoded_csv=self.geo_csv)
-
-        self.gvs_checked = self.gvs_process.process_csv_gvs()
+        self.gvs_process = GVSProcess(geocoded_csv=self.geo_csv, cache_db=cli_args.get("gvs_cache_db"))
+        try:
+            self.gvs_checked = self.gvs_process.process_csv_gvs()
+        finally:
+            self.gvs_process.close()
 
         self.logger.info("Initializing and cleaning coordinates...")
         self.clean_coords = CleanCoords(self.gvs_checked)
@@ -33,7 +35,9 @@ class ProcessAll:
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run the full geolocation pipeline.')
     parser.add_argument('--cache-db', type=str, default=None, help='SQLite cache DB filename')
+    parser.add_argument('--gvs-cache-db', type=str, default=None, help='SQLite cache DB file for GVS results')
     parser.add_argument('-t', '--delay', type=float, default=0.6, help='Delay between GEOLocate API calls')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Concurrent GEOLocate requests')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable debug logging')
     parser.add_argument('--country', default='country', help='Country field name')
     parser.add_argument('--state', default='state', help='State field name')
@@ -1,15 +1,53 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import orjson
 import pandas as pd
 import requests
-import json
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 class GVSProcess:
-    def __init__(self, geocoded_csv):
+    CACHE_SCALE = 10 ** 5  # cache keys are coordinates rounded to 5 decimal places
+
+    def __init__(self, geocoded_csv, cache_db: str | None = None):
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
         self.input_csv = geocoded_csv.reset_index(drop=True)
         self.merged_df = None
-        self.process_csv_gvs()
+        self._session = self._build_session()
+        self._cache_conn = self._open_cache(cache_db or 'gvs_cache.sqlite')
+
+    @staticmethod
+    def _open_cache(cache_db: str) -> sqlite3.Connection:
+        """Open the GVS result cache, creating its table on first use."""
+        conn = sqlite3.connect(cache_db)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS gvs_cache "
+            "(opts TEXT, lat INTEGER, lon INTEGER, payload BLOB, PRIMARY KEY(opts, lat, lon))"
+        )
+        return conn
+
+    def close(self):
+        """Close the GVS cache connection and HTTP session."""
+        self._cache_conn.close()
+        self._session.close()
+
+    @staticmethod
+    def _build_session(pool_size: int = 16) -> requests.Session:
+        """Create a keep-alive session shared by every GVS request, retrying transient gateway errors."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504],
+                              allowed_methods=frozenset(['POST']))
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
     def filter_lat_long_frame(self):
         """Extract Geo_Lat and Geo_Lon if available and valid."""
@@ -17,16 +55,8 @@ class GVSProcess:
         if not all(col in self.input_csv.columns for col in required_columns):
             raise ValueError("Geo_Lat and Geo_Lon must exist in input data")
 
-        df = self.input_csv[required_columns].dropna()
-        df = df[(df['Geo_Lat'].apply(self._is_number)) & (df['Geo_Lon'].apply(self._is_number))]
-        return df.drop_duplicates().copy()
-
-    def _is_number(self, x):
-        try:
-            float(x)
-            return True
-        except (ValueError, TypeError):
-            return False
+        df = self.input_csv[required_columns].apply(pd.to_numeric, errors='coerce').dropna()
+        return df.drop_duplicates()
 
     def batch_query_gvs(
             self,
@@ -35,61 +65,144 @@ class GVSProcess:
             mode: str = "resolve",
             maxdist: float | None = 10,
             maxdistrel: float | None = 0.1,
-            chunk_size: int = 100
+            chunk_size: int = 100,
+            max_workers: int = 8
     ) -> pd.DataFrame | None:
-        """Query GVS API in chunks and return a concatenated results DataFrame with exact float coordinate mapping."""
+        """Query GVS API in parallel chunks and return a concatenated results DataFrame aligned to the request coordinates."""
         if coords_df.empty:
             self.logger.warning("No valid coordinates to query.")
             return None
 
+        coords_df = coords_df.reset_index(drop=True)
+        for col_name in ["Geo_Lat", "Geo_Lon"]:
+            coords_df[col_name] = pd.to_numeric(coords_df[col_name], errors="coerce")
+
+        # Unparseable or infinite cells can't be cache-keyed or sent to GVS, so skip those rows
+        finite = np.isfinite(coords_df[["Geo_Lat", "Geo_Lon"]].to_numpy(dtype=float)).all(axis=1)
+        if not finite.all():
+            self.logger.warning(f"Skipping {int((~finite).sum())} rows with non-numeric or infinite coordinates")
+            coords_df = coords_df[finite].reset_index(drop=True)
+            if coords_df.empty:
+                self.logger.warning("No valid coordinates to query.")
+                return None
+
+        # Every argument that changes the GVS response is part of the cache key
+        opts = {"mode": mode, "maxdist": maxdist, "maxdistrel": maxdistrel}
+        opts_key = orjson.dumps({"api_url": api_url, **opts}).decode()
+        keys = list(zip(self._cache_key(coords_df["Geo_Lat"]), self._cache_key(coords_df["Geo_Lon"])))
+        cached = self._load_cached(opts_key, keys)
+        hit_mask = pd.Series([key in cached for key in keys])
+
         all_results = []
+        if hit_mask.any():
+            hits = coords_df[hit_mask].reset_index(drop=True)
+            payloads = pd.DataFrame([cached[key] for key, hit in zip(keys, hit_mask) if hit])
+            all_results.append(hits.join(payloads, rsuffix='_gvs'))
+            self.logger.info(f"{len(hits)} of {len(coords_df)} coordinates served from the GVS cache")
+
+        misses = coords_df[~hit_mask]
         headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
             "charset": "UTF-8"
         }
-        for i in range(0, len(coords_df), chunk_size):
-            chunk_df = coords_df.iloc[i:i + chunk_size].copy()
-            chunk_coords = chunk_df[["Geo_Lat", "Geo_Lon"]].values.tolist()
-
+        chunks = []
+        for i in range(0, len(misses), chunk_size):
+            chunk_df = misses.iloc[i:i + chunk_size].copy()
             payload = {
-                "opts": {"mode": mode, "maxdist": maxdist, "maxdistrel": maxdistrel},
-                "data": chunk_coords
+                "opts": opts,
+                "data": chunk_df[["Geo_Lat", "Geo_Lon"]].values.tolist()
             }
+            chunks.append((i // chunk_size + 1, chunk_df, payload))
 
-            try:
-                resp = requests.post(api_url, headers=headers, data=json.dumps(payload))
-                resp.raise_for_status()
-                result = pd.DataFrame(resp.json())
-
-                if result.empty:
-                    self.logger.warning(f"No GVS results returned for chunk {i // chunk_size + 1}")
-                    continue
+        # Chunks are independent, so post them concurrently; map() keeps results in chunk order
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            merged_chunks = executor.map(lambda chunk: self._post_chunk(api_url, headers, *chunk), chunks)
+            fetched = [merged for merged in merged_chunks if merged is not None]
 
-                result.rename(columns={'latitude_verbatim': 'Geo_Lat', 'longitude_verbatim': 'Geo_Lon'}, inplace=True)
-
-                for col_name in ["Geo_Lat", "Geo_Lon"]:
-                    chunk_df[col_name] = pd.to_numeric(chunk_df[col_name], errors="coerce")
-                    result[col_name] = pd.to_numeric(result[col_name], errors="coerce")
-
-                merged = pd.merge(
-                    chunk_df,
-                    result,
-                    on=["Geo_Lat", "Geo_Lon"],
-                    suffixes=('', '_gvs')
-                )
-
-                all_results.append(merged)
-
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"GVS API error on chunk {i // chunk_size + 1}: {e}")
-                continue
+        if fetched:
+            self._store_cached(opts_key, pd.concat(fetched, ignore_index=True))
+            all_results.extend(fetched)
 
         if not all_results:
             return None
 
         return pd.concat(all_results, ignore_index=True)
 
+    def _cache_key(self, values: pd.Series) -> list[int]:
+        """Scale coordinates to integers so float noise past 5 decimals maps to the same cache row."""
+        return (values * self.CACHE_SCALE).round().astype('int64').tolist()
+
+    def _load_cached(self, opts_key: str, keys: list[tuple[int, int]], batch_size: int = 400) -> dict:
+        """Fetch cached GVS rows for the given request options and coordinate keys, returning {(lat, lon): row_dict}."""
+        # Each query binds 1 + 2 * batch_size values; stay under SQLite's pre-3.32 default cap of 999
+        cached = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), batch_size):
+            batch = unique_keys[i:i + batch_size]
+            placeholders = ", ".join(["(?, ?)"] * len(batch))
+            rows = self._cache_conn.execute(
+                f"SELECT lat, lon, payload FROM gvs_cache WHERE opts = ? AND (lat, lon) IN (VALUES {placeholders})",
+                [opts_key, *(part for key in batch for part in key)]
+            )
+            for lat, lon, payload in rows:
+                cached[(lat, lon)] = orjson.loads(payload)
+        return cached
+
+    def _store_cached(self, opts_key: str, results: pd.DataFrame):
+        """Persist freshly fetched GVS rows keyed by their request options and coordinates."""
+        lat_keys = self._cache_key(results["Geo_Lat"])
+        lon_keys = self._cache_key(results["Geo_Lon"])
+        records = results.drop(columns=["Geo_Lat", "Geo_Lon"]).to_dict('records')
+        with self._cache_conn:
+            self._cache_conn.executemany(
+                "INSERT OR REPLACE INTO gvs_cache (opts, lat, lon, payload) VALUES (?, ?, ?, ?)",
+                [(opts_key, lat, lon, orjson.dumps(record)) for lat, lon, record in zip(lat_keys, lon_keys, records)]
+            )
+
+    def _post_chunk(
+            self,
+            api_url: str,
+            headers: dict,
+            chunk_num: int,
+            chunk_df: pd.DataFrame,
+            payload: dict
+    ) -> pd.DataFrame | None:
+        """POST a single chunk to GVS and attach the response rows to the chunk's coordinates."""
+        try:
+            resp = self._session.post(api_url, headers=headers, data=orjson.dumps(payload))
+            resp.raise_for_status()
+            result = pd.DataFrame(orjson.loads(resp.content))
+
+            if result.empty:
+                self.logger.warning(f"No GVS results returned for chunk {chunk_num}")
+                return None
+
+            # GVS answers in request order, so align rows by position instead of joining on float coordinates
+            if len(result) == len(chunk_df):
+                result.drop(columns=['latitude_verbatim', 'longitude_verbatim'], errors='ignore', inplace=True)
+                return chunk_df.reset_index(drop=True).join(result, rsuffix='_gvs')
+
+            # Row counts disagree, so position is unreliable; match on the echoed verbatim coordinates instead
+            self.logger.warning(
+                f"GVS returned {len(result)} rows for {len(chunk_df)} coordinates in chunk {chunk_num}; "
+                f"merging on verbatim coordinates"
+            )
+            result.rename(columns={'latitude_verbatim': 'Geo_Lat', 'longitude_verbatim': 'Geo_Lon'}, inplace=True)
+            for col_name in ["Geo_Lat", "Geo_Lon"]:
+                result[col_name] = pd.to_numeric(result[col_name], errors="coerce")
+
+            return pd.merge(
+                chunk_df,
+                result,
+                on=["Geo_Lat", "Geo_Lon"],
+                suffixes=('', '_gvs')
+            )
+
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            self.logger.error(f"GVS API error on chunk {chunk_num}: {e}")
+            return None
+
     def process_csv_gvs(self):
         """Runs GVS geocoding and merges results back into original DataFrame using lat/lon."""
         coord_frame = self.filter_lat_long_frame()
@@ -99,11 +212,9 @@ class GVSProcess:
             self.logger.error("No data returned from GVS API.")
             return
 
-        # Coerce coordinate columns to numeric
-        for df in [self.input_csv, gvs_result_df]:
-            if df is not None:
-                for col in ['Geo_Lat', 'Geo_Lon']:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+        # batch_query_gvs already returns numeric coordinates; only the input side needs coercing
+        for col in ['Geo_Lat', 'Geo_Lon']:
+            self.input_csv[col] = pd.to_numeric(self.input_csv[col], errors='coerce')
 
         gvs_result_df.rename(
             columns={'country': 'gvs_country', 'state': 'gvs_state', 'county': 'gvs_county'},
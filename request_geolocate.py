@@ -7,20 +7,48 @@ georeferences using GEOLocate API, and stores results in self.geocoded_data.
 """
 
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from types import SimpleNamespace
+from urllib.parse import urlencode
 import bels_reformat
+import numpy as np
+import orjson
 import pandas as pd
 import requests
 import requests_cache
+from requests.adapters import HTTPAdapter
+
+
+class _RateLimiter:
+    """Spaces calls at least `interval` seconds apart across all threads that share it."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def widen(self, interval: float):
+        """Raises the spacing to `interval` if that is stricter than the current one."""
+        with self._lock:
+            self.interval = max(self.interval, interval)
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
 
 
 class Geolocate:
     """Processes all CSVs in geo_csvs/input_csv and returns georeferenced results as a DataFrame."""
 
-    @dataclass
+    @dataclass(slots=True, frozen=True)
     class Result:
         latitude: float
         longitude: float
@@ -42,29 +70,66 @@ class Geolocate:
         'displacePoly': 'false',
         'languageKey': '0'
     }
+    MAX_ATTEMPTS = 3  # per uncached query, for timeouts, connection errors and 5xx responses
+    RETRY_BACKOFF = 0.3  # seconds, doubled after each failed attempt
+    _logging_configured = False
+    _sessions: dict[tuple[str, int], requests_cache.CachedSession] = {}  # shared across instances
+    _rate_limiter: _RateLimiter | None = None  # one per process, since every instance hits the same endpoint
 
     def __init__(self, params: dict = None):
         self.args = self._dict_to_namespace(params or {})
         self.geocoded_data = pd.DataFrame()
+        self._rate_limiter = self._get_rate_limiter(self.args.delay)
+        # The fixed options are encoded once; each query only appends its own fields
+        self._base_url = f"{self.ENDPOINT}?{urlencode({**self.DEFAULT_OPTS, 'fmt': 'json'})}&"
 
-        logging.basicConfig(
-            level=logging.DEBUG if self.args.verbose else logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        if not Geolocate._logging_configured:
+            logging.basicConfig(
+                level=logging.DEBUG if self.args.verbose else logging.INFO,
+                format='%(asctime)s - %(levelname)s - %(message)s'
+            )
+            Geolocate._logging_configured = True
 
-        requests_cache.install_cache(
-            cache_name=self.args.cache_db or 'geolocate_cache',
-            backend='sqlite',
-            expire_after=None
-        )
+        self._session = self._get_session(self.args.cache_db or 'geolocate_cache', self.args.workers)
 
         self._process()
 
+    @staticmethod
+    def _get_rate_limiter(delay: float) -> _RateLimiter:
+        """Returns the process-wide GEOLocate rate limiter, using the largest delay any instance asked for."""
+        if Geolocate._rate_limiter is None:
+            Geolocate._rate_limiter = _RateLimiter(delay)
+        else:
+            Geolocate._rate_limiter.widen(delay)
+        return Geolocate._rate_limiter
+
+    @classmethod
+    def _get_session(cls, cache_name: str, pool_size: int) -> requests_cache.CachedSession:
+        """Returns the process-wide cached session for this cache DB, opening it on first use."""
+        key = (cache_name, pool_size)
+        if key not in cls._sessions:
+            # WAL lets the worker threads read while a response is being saved; fast_save skips
+            # the fsync per write, which is an acceptable risk for a cache that can be refetched
+            session = requests_cache.CachedSession(
+                cache_name=cache_name,
+                backend='sqlite',
+                expire_after=None,
+                wal=True,
+                fast_save=True
+            )
+            # No adapter-level retries: _request_features retries through the rate limiter instead
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            cls._sessions[key] = session
+        return cls._sessions[key]
+
     @staticmethod
     def _dict_to_namespace(d: dict):
         """Convert dict to SimpleNamespace with defaults."""
         ns = SimpleNamespace(
             delay=d.get('delay', 0.6),
+            workers=d.get('workers', 4),
             verbose=d.get('verbose', False),
             cache_db=d.get('cache_db', None),
             country=d.get('country', 'country'),
@@ -74,15 +139,37 @@ class Geolocate:
         )
         return ns
 
-    def _georef(self, user_params: dict) -> list['Geolocate.Result']:
-        """Calls GEOLocate API with user params, returns parsed result list."""
-        params = {**self.DEFAULT_OPTS, **user_params, 'fmt': 'json'}
-        logging.debug(f"Requesting GEOLocate API with params: {params}")
-        resp = requests.get(self.ENDPOINT, params=params)
+    def _request_features(self, user_params: dict) -> list[dict]:
+        """Calls GEOLocate API with user params, returns the raw GeoJSON feature list."""
+        # Like requests' params handling, drop None values rather than sending the string 'None'
+        url = self._base_url + urlencode({k: v for k, v in user_params.items() if v is not None})
+        logging.debug(f"Requesting GEOLocate API: {url}")
+        resp = self._session.get(url, timeout=10, only_if_cached=True)
+        if resp.status_code == 504:  # requests_cache's "not cached" reply; only real requests are throttled
+            resp = self._fetch_with_retries(url)
         resp.raise_for_status()
+        return orjson.loads(resp.content).get('resultSet', {}).get('features', [])
+
+    def _fetch_with_retries(self, url: str) -> requests.Response:
+        """Sends an uncached GEOLocate request, retrying transient failures; every attempt waits its rate-limit turn."""
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            self._rate_limiter.wait()
+            try:
+                resp = self._session.get(url, timeout=10)
+                if resp.status_code < 500:
+                    return resp
+                resp.raise_for_status()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.HTTPError) as e:
+                if attempt == self.MAX_ATTEMPTS:
+                    raise
+                logging.warning(f"GEOLocate attempt {attempt} failed, retrying: {e}")
+                time.sleep(self.RETRY_BACKOFF * 2 ** (attempt - 1))
 
+    def _georef(self, user_params: dict) -> list['Geolocate.Result']:
+        """Calls GEOLocate API with user params, returns parsed result list."""
         results = []
-        for feat in resp.json().get('resultSet', {}).get('features', []):
+        for feat in self._request_features(user_params):
             p = feat['properties']
             lon, lat = feat['geometry']['coordinates']
             results.append(self.Result(
@@ -99,37 +186,42 @@ class Geolocate:
             ))
         return results
 
-    def _decimal_places(self, val):
-        """Returns the number of decimal places in a float or stringified float."""
+    def _georef_best(self, user_params: dict) -> tuple[int, tuple[float, float, dict] | None]:
+        """Calls GEOLocate API with user params, returns the result count and the top (lat, lon, properties)."""
+        features = self._request_features(user_params)
+        if not features:
+            return 0, None
+        lon, lat = features[0]['geometry']['coordinates']
+        return len(features), (lat, lon, features[0]['properties'])
+
+    def _try_georef_best(self, user_params: dict) -> tuple[int, tuple[float, float, dict] | None] | None:
+        """Like _georef_best, but logs and returns None on failure so one bad query can't abort the run."""
         try:
-            s = str(val)
-            if '.' in s:
-                return len(s.split('.')[-1].rstrip('0'))
-        except Exception:
-            pass
-        return 0
+            return self._georef_best(user_params)
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            logging.error(f"GEOLocate request failed for query {user_params}: {e}")
+            return None
 
+    @staticmethod
+    def _decimal_places(values: pd.Series) -> np.ndarray:
+        """Returns the number of decimal places, ignoring trailing zeros, of each float or stringified float."""
+        places = values.astype(str).str.extract(r'\.(\d*?)0*$', expand=False).str.len()
+        return places.fillna(0).to_numpy(dtype=np.int64)
 
     def _round_coords(self):
         """Rounds Geo_Lat and Geo_Lon to the least precise decimal place between the two per row."""
+        lat = pd.to_numeric(self.geocoded_data['Geo_Lat'], errors='coerce').to_numpy()
+        lon = pd.to_numeric(self.geocoded_data['Geo_Lon'], errors='coerce').to_numpy()
+        mask = ~(np.isnan(lat) | np.isnan(lon))
+        if not mask.any():
+            return
 
-        def _round_row(row):
-            lat = row['Geo_Lat']
-            lon = row['Geo_Lon']
-            try:
-                lat_dp = self._decimal_places(lat)
-                lon_dp = self._decimal_places(lon)
-                target_dp = min(lat_dp, lon_dp)
-
-                if pd.notnull(lat) and pd.notnull(lon):
-                    row['Geo_Lat'] = round(float(lat), target_dp)
-                    row['Geo_Lon'] = round(float(lon), target_dp)
-            except Exception:
-                pass
-            return row
-
-        self.geocoded_data = self.geocoded_data.apply(_round_row, axis=1)
+        target_dp = np.minimum(self._decimal_places(self.geocoded_data['Geo_Lat']),
+                               self._decimal_places(self.geocoded_data['Geo_Lon']))[mask]
+        scale = np.power(10.0, target_dp)
 
+        self.geocoded_data.loc[mask, 'Geo_Lat'] = np.round(lat[mask] * scale) / scale
+        self.geocoded_data.loc[mask, 'Geo_Lon'] = np.round(lon[mask] * scale) / scale
 
     def _load_and_concat_csvs(self, folder: Path) -> pd.DataFrame:
         """Loads and concatenates all CSV files from the input folder."""
@@ -137,81 +229,85 @@ class Geolocate:
         if not all_csvs:
             raise FileNotFoundError(f"No CSV files found in {folder}")
         logging.info(f"Loading {len(all_csvs)} files from {folder}")
-        return pd.concat([pd.read_csv(f) for f in all_csvs], ignore_index=True)
+        return pd.concat([bels_reformat.read_bels_csv(f) for f in all_csvs], ignore_index=True)
 
     def _process(self):
         input_folder = Path("geo_csvs/input_csv")
         df = self._load_and_concat_csvs(input_folder)
         df = bels_reformat.rename_drop_columns(df)
 
-        df.reset_index(inplace=True)  # Keep track of original row order
-        all_results = []
-
-        for idx, row in df.iterrows():
-
-            row_data = {
-                'index': idx,
-                'country': row.get('country', ''),
-                'stateprovince': row.get('stateprovince', ''),
-                'county': row.get('county', ''),
-                'locality': row.get('locality', ''),
-                'bels_match': row.get('bels_match', False),
-                'Geo_Source': '',
-                'Geo_NumResults': '',
-                'Geo_ResultID': '',
-                'Geo_Lat': '',
-                'Geo_Lon': '',
-                'Geo_UncertaintyM': '',
-                'Geo_Score': '',
-                'Geo_Precision': '',
-                'Geo_ParsePattern': '',
-                'datum': row.get('datum', ''),
-                'coordinate_uncertainty_meters': row.get('coordinate_uncertainty_meters', ''),
-            }
-
-            if row_data['bels_match']:
-                # Use BELS output
-                row_data['Geo_Lat'] = row.get('latitude')
-                row_data['Geo_Lon'] = row.get('longitude')
-                row_data['Geo_UncertaintyM'] = row.get('coordinate_uncertainty_meters')
-                row_data['Geo_ResultID'] = ''
-                row_data['Geo_Source'] = 'bels'
-            else:
-                # Use GEOLocate
-                params = {
-                    'country': row_data['country'],
-                    'state': row_data['stateprovince'],
-                    'county': row_data['county'],
-                    'locality': row_data['locality']
-                }
-                logging.debug(f"Sending GEOLocate query: {params}")
-                results = self._georef(params)
-                row_data['Geo_Source'] = 'geolocate'
-                row_data['Geo_NumResults'] = len(results)
-
-                if results:
-                    res = results[0]
-                    row_data.update({
-                        'Geo_ResultID': 1,
-                        'Geo_Lat': res.latitude,
-                        'Geo_Lon': res.longitude,
-                        'Geo_UncertaintyM': res.uncertainty_radius_m,
-                        'Geo_Score': res.score,
-                        'Geo_Precision': res.precision,
-                        'Geo_ParsePattern': res.parse_pattern
-                    })
-
-                time.sleep(self.args.delay)
-
-            all_results.append(row_data)
-
-        self.geocoded_data = pd.DataFrame(all_results)
-
-        columns_to_drop = ['latitude', 'longitude', 'latitude_x', 'longitude_x',
-                           'country_x', 'country_y', 'state', 'stateprovince_x', 'stateprovince_y',
-                           'county_x', 'county_y']
-
-        self.geocoded_data.drop(columns=[col for col in columns_to_drop if col in self.geocoded_data.columns],
-                                inplace=True)
+        # _load_and_concat_csvs leaves a RangeIndex, so df.index is already each row's original position
+        n = len(df)
+
+        # Output columns are filled by position rather than assembled from per-row dicts
+        bels_match = df['bels_match'].to_numpy(dtype=bool)
+        geo_source = np.where(bels_match, 'bels', '').astype(object)
+        geo_num_results = np.full(n, '', dtype=object)
+        geo_result_id = np.full(n, '', dtype=object)
+        geo_lat = np.where(bels_match, pd.to_numeric(df['latitude'], errors='coerce'), np.nan)
+        geo_lon = np.where(bels_match, pd.to_numeric(df['longitude'], errors='coerce'), np.nan)
+        geo_uncertainty = np.full(n, '', dtype=object)
+        if 'coordinate_uncertainty_meters' in df.columns:
+            geo_uncertainty[bels_match] = df['coordinate_uncertainty_meters'].to_numpy(dtype=object)[bels_match]
+        geo_score = np.full(n, '', dtype=object)
+        geo_precision = np.full(n, '', dtype=object)
+        geo_parse_pattern = np.full(n, '', dtype=object)
+
+        # GEOLocate param -> input column; missing input columns are queried as empty strings
+        query_columns = {'country': 'country', 'state': 'stateprovince', 'county': 'county', 'locality': 'locality'}
+        query_frame = pd.DataFrame({param: df.get(col, '') for param, col in query_columns.items()}, index=df.index)
+
+        queries = {}  # query key -> (GEOLocate params, positions of rows sharing them)
+        for idx, *values in query_frame[~bels_match].itertuples(name=None):
+            # Use GEOLocate, queried below once per distinct locality
+            params = dict(zip(query_columns, values))
+            # Key on the string form so NaN fields group together, matching what ends up in the URL
+            key = tuple(str(value) for value in values)
+            queries.setdefault(key, (params, []))[1].append(idx)
+
+        logging.info(f"Querying GEOLocate for {len(queries)} distinct localities")
+
+        # Requests are I/O bound, so keep several in flight; the shared rate limiter enforces `delay`
+        with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
+            unique_queries = list(queries.values())
+            responses = executor.map(lambda query: self._try_georef_best(query[0]), unique_queries)
+            for (params, positions), response in zip(unique_queries, responses):
+                geo_source[positions] = 'geolocate'
+                if response is None:
+                    continue  # failed query, already logged; its rows keep empty results
+
+                num_results, best = response
+                logging.debug(f"Received {num_results} GEOLocate results for query: {params}")
+                geo_num_results[positions] = num_results
+
+                if best is not None:
+                    lat, lon, props = best
+                    geo_result_id[positions] = 1
+                    geo_lat[positions] = lat
+                    geo_lon[positions] = lon
+                    geo_uncertainty[positions] = props.get('uncertaintyRadiusMeters')
+                    geo_score[positions] = props.get('score')
+                    geo_precision[positions] = props.get('precision')
+                    geo_parse_pattern[positions] = props.get('parsePattern')
+
+        self.geocoded_data = pd.DataFrame({
+            'index': df.index,
+            'country': df.get('country', ''),
+            'stateprovince': df.get('stateprovince', ''),
+            'county': df.get('county', ''),
+            'locality': df.get('locality', ''),
+            'bels_match': bels_match,
+            'Geo_Source': geo_source,
+            'Geo_NumResults': geo_num_results,
+            'Geo_ResultID': geo_result_id,
+            'Geo_Lat': geo_lat,
+            'Geo_Lon': geo_lon,
+            'Geo_UncertaintyM': geo_uncertainty,
+            'Geo_Score': geo_score,
+            'Geo_Precision': geo_precision,
+            'Geo_ParsePattern': geo_parse_pattern,
+            'datum': df.get('datum', ''),
+            'coordinate_uncertainty_meters': df.get('coordinate_uncertainty_meters', ''),
+        })
 
         self._round_coords()